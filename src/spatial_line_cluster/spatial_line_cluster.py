@@ -1,8 +1,90 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import geopandas as gpd
-import networkx as nx
-from shapely import wkt
+import numpy as np
+import pandas as pd
+import pyproj
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from shapely.geometry.base import BaseGeometry
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_transformer(src_crs, dst_crs):
+    """
+    Return a `pyproj.Transformer` between two CRS. Transformers are cached, so each pair
+    of CRS is only set up once and reused across calls to `process_clustering`.
+    """
+    return pyproj.Transformer.from_crs(src_crs,dst_crs,always_xy=True)
+
+
+def _projected_lengths(geoms, transformer):
+    """
+    Compute the length of each geometry after projecting its coordinates with `transformer`.
+    The coordinates are transformed as plain arrays and the segment lengths are summed per
+    geometry with NumPy, so no projected geometry is built. Polygons are measured along
+    their rings, as `shapely.length` does.
+    """
+    # 1. Split multi-part geometries and polygons into simple lines
+    if (shapely.get_type_id(geoms) == shapely.GeometryType.LINESTRING).all():
+        # Fast path: LineStrings are already simple lines
+        lines, line_owner = geoms, np.arange(len(geoms))
+    else:
+        # Multi-part geometries can be nested in collections, so split until all are simple
+        parts, part_owner = geoms, np.arange(len(geoms))
+        multi_types = [shapely.GeometryType.MULTIPOINT,shapely.GeometryType.MULTILINESTRING,shapely.GeometryType.MULTIPOLYGON,shapely.GeometryType.GEOMETRYCOLLECTION]
+        is_multi = np.isin(shapely.get_type_id(parts),multi_types)
+        while is_multi.any():
+            sub_parts, sub_owner = shapely.get_parts(parts[is_multi],return_index=True)
+            parts = np.concatenate([parts[~is_multi],sub_parts])
+            part_owner = np.concatenate([part_owner[~is_multi],part_owner[is_multi][sub_owner]])
+            is_multi = np.isin(shapely.get_type_id(parts),multi_types)
+
+        is_polygon = shapely.get_type_id(parts) == shapely.GeometryType.POLYGON
+        rings, ring_owner = shapely.get_rings(parts[is_polygon],return_index=True)
+        lines = np.concatenate([parts[~is_polygon],rings])
+        line_owner = np.concatenate([part_owner[~is_polygon],part_owner[is_polygon][ring_owner]])
+
+    # 2. Project the coordinates
+    coords, coord_line = shapely.get_coordinates(lines,return_index=True)
+    x, y = transformer.transform(coords[:,0],coords[:,1])
+
+    # 3. Sum the segments, skipping the gaps between consecutive lines
+    same_line = coord_line[1:] == coord_line[:-1]
+    segments = np.hypot(np.diff(x),np.diff(y))[same_line]
+    owner = line_owner[coord_line[:-1][same_line]]
+    return np.bincount(owner,weights=segments,minlength=len(geoms))
+
+
+def _dedup_pairs(left, right):
+    """
+    Keep one copy of each symmetric pair returned by a self query of the spatial index and
+    drop the pairs of a geometry with itself. The spatial index returns both (i, j) and
+    (j, i), so keeping the pairs with i < j is enough to make them unique.
+    """
+    keep = np.flatnonzero(left < right)
+    return left.take(keep), right.take(keep)
+
+
+def _dwithin_in_threads(left_geoms, right_geoms, distance:float, n_jobs:int):
+    """
+    Evaluate `shapely.dwithin` element-wise over two geometry arrays, splitting the
+    work in `n_jobs` chunks across a pool of threads. GEOS releases the GIL, so the chunks
+    run in parallel. Returns a boolean mask with one value per pair.
+    """
+    chunks = np.array_split(np.arange(len(left_geoms)),n_jobs)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        masks = executor.map(lambda idx: shapely.dwithin(left_geoms[idx],right_geoms[idx],distance),chunks)
+
+    return np.concatenate(list(masks))
+
 
 class SpatialLineCluster:
     def __init__(self):
@@ -15,91 +97,64 @@ class SpatialLineCluster:
     def build_geodataframe(self,df:object,geometry_column_name:str, crs:str|None=None):
         """
         Function to convert a DataFrame to GeoDataFrame. Evaluates if the input object it's already a GeoDataFrame
+        If the geometries are available as WKB, prefer `from_wkb`, which is faster than parsing WKT
         """
         if crs is None:
             raise ValueError("⚠️ CRS is required. e.g: 'EPSG:4326' ")
         else:
             crs
         # Evaluate geometry column is already a shapely object
-        def safe_wkt_load(x):
-            if isinstance(x,str):
-                return wkt.loads(x)
-            elif isinstance(x,BaseGeometry):
-                return x
-            else:
-                raise TypeError(f"Data type not recognized: {type(x)}")
+        def safe_wkt_load(values):
+            is_str = np.fromiter((isinstance(x,str) for x in values),dtype=bool,count=len(values))
+            not_recognized = [x for x in values[~is_str] if not isinstance(x,BaseGeometry)]
+            if not_recognized:
+                raise TypeError(f"Data type not recognized: {type(not_recognized[0])}")
+
+            # Parse all the WKT strings at once
+            parsed = np.empty(len(values),dtype=object)
+            parsed[is_str] = shapely.from_wkt(values[is_str].astype(str))
+            parsed[~is_str] = values[~is_str]
+            return parsed
             
         if self.is_geodataframe(df) == False:
-            # Convert to a geometry
-            df_copy = df.copy()
-
             # Evaluate if dataset contains a column named: "geometry"
-            cols_list = list(df_copy.columns)
-            
-            if cols_list.count("geometry"):
+            if "geometry" in df.columns:
                 # create a GeoDataFrame
-                gdf = gpd.GeoDataFrame(df_copy,geometry="geometry", crs=crs)
+                gdf = gpd.GeoDataFrame(df,geometry="geometry", crs=crs)
             else:
-                df_copy["geometry"] = df_copy[geometry_column_name].apply(safe_wkt_load)
-                
-                # Create a GeoDataFrame
-                gdf = gpd.GeoDataFrame(df_copy,geometry="geometry", crs=crs)
+                # Convert to a geometry
+                parsed = safe_wkt_load(df[geometry_column_name].to_numpy(dtype=object))
+                geometry = gpd.GeoSeries(parsed,index=df.index,crs=crs)
 
-                # Remove the geometry column name to avoid duplicated geometries
-                gdf = gdf.drop(columns=[geometry_column_name])
+                # Create a GeoDataFrame. Remove the geometry column name to avoid duplicated geometries
+                gdf = gpd.GeoDataFrame(df.drop(columns=[geometry_column_name]),geometry=geometry, crs=crs)
 
             return gdf  
         else:
             return df
     
-    def determine_utm_and_reproject(self,row,geometry_col_name:str,crs=None):
+    def from_wkb(self,df:object,wkb_column_name:str, crs:str|None=None):
         """
-        Determine the appropriate UTM zone for a geometry and calculate its length in meters.
-    
-        This method takes a row of data containing a geometry, determines the optimal UTM 
-        (Universal Transverse Mercator) coordinate reference system for that geometry based 
-        on its location, reprojects the geometry to that UTM CRS, and returns both the EPSG 
-        code and the geometry's length in the projected coordinate system.
-    
-        Parameters
-        ----------
-        row : pandas.Series or dict-like 
-            A row of data containing the geometry and associated attributes.
-        geometry_col_name : str
-            The name of the column containing the geometry object.
-        crs : str or pyproj.CRS, optional
-            The coordinate reference system of the input geometry. 
-            Defaults to "EPSG:4326" (WGS84) if not specified.
-    
-        Returns
-        -------
-        tuple of (int, float)
-            A tuple containing:
-            - int: The EPSG code of the determined UTM zone
-            - float: The length of the geometry in meters in the projected CRS
+        Function to convert a DataFrame with a WKB geometry column (bytes or hex strings) to GeoDataFrame
         """
-        _crs = crs if crs is not None else "EPSG:4326"
-
-    
-        # 1. Define CRS
-        temporal_gdf = gpd.GeoDataFrame([row],geometry=geometry_col_name,crs=_crs)
-
-        # 2. Determine the CRS of the geometry
-        utm_crs = temporal_gdf.estimate_utm_crs()
+        if crs is None:
+            raise ValueError("⚠️ CRS is required. e.g: 'EPSG:4326' ")
 
-        # 3. Get a reprojected dataset
-        data_reprojected = temporal_gdf.to_crs(utm_crs).geometry.iloc[0]
+        # Parse all the WKB values at once
+        geometry = gpd.GeoSeries(shapely.from_wkb(df[wkb_column_name].to_numpy()),index=df.index,crs=crs)
 
-        return utm_crs.to_epsg(), data_reprojected.length
+        # Create a GeoDataFrame. Remove the WKB column name to avoid duplicated geometries
+        return gpd.GeoDataFrame(df.drop(columns=[wkb_column_name]),geometry=geometry, crs=crs)
 
-    def add_utm_projection_metrics(self, gdf:object, geometry_col_name:str):
+    def add_utm_projection_metrics(self, gdf:object, geometry_col_name:str, inplace:bool=False):
         """
         Add UTM projection information and metric lengths to a GeoDataFrame.
     
-        This method processes each row of a GeoDataFrame, determines the optimal UTM zone
-        for each geometry, and calculates the geometry's length in meters. The results are
-        added as two new columns: 'utm_epsg' (the EPSG code of the UTM zone) and 'len_mt'
-        (the length in meters).
+        This method determines the optimal UTM zone for each geometry from the longitude and
+        latitude of its representative point, and calculates the geometry's length in meters.
+        Rows sharing the same UTM zone are reprojected together with a single transformer.
+        The results are added as two new columns: 'utm_epsg' (the EPSG code of the UTM zone)
+        and 'len_mt' (the length in meters).
 
         Parameters
         ----------
@@ -107,19 +162,42 @@ class SpatialLineCluster:
             The input GeoDataFrame containing geometries to process.
         geometry_col_name : str
             The name of the column containing the geometry objects.
+        inplace : bool, optional
+            If True, the columns are added to the input GeoDataFrame instead of a copy,
+            which avoids copying all the existing columns. Default is False.
     
         Returns
         -------
         gpd.GeoDataFrame
-            A copy of the input GeoDataFrame with two additional columns:
+            A copy of the input GeoDataFrame (or the input itself if `inplace` is True)
+            with two additional columns:
             - 'utm_epsg' (int): The EPSG code of the determined UTM zone for each geometry
             - 'len_mt' (float): The length of each geometry in meters
         """
-        gdf_copy = gdf.copy()
-        gdf_copy[["utm_epsg","len_mt"]] = gdf_copy.apply(self.determine_utm_and_reproject,axis=1,args=(geometry_col_name,),result_type="expand")
+        _crs = pyproj.CRS(gdf.crs if gdf.crs is not None else "EPSG:4326")
+        geometries = gpd.GeoSeries(gdf[geometry_col_name].values,crs=_crs)
+        geoms_arr = np.asarray(geometries.values)
+
+        # 1. Determine the UTM zone of each geometry from its representative point
+        points = geometries.representative_point().to_crs("EPSG:4326")
+        # Empty geometries have an empty point (NaN coordinates) and are measured as 0 meters
+        lon = np.nan_to_num(points.x.to_numpy())
+        lat = np.nan_to_num(points.y.to_numpy())
+        zone = np.clip(((lon + 180.0) // 6).astype(np.int32) + 1,1,60)
+        epsg = np.where(lat >= 0, 32600 + zone, 32700 + zone)
+
+        # 2. Reproject the geometries sharing the same UTM zone at once
+        len_mt = np.empty(len(geometries),dtype=float)
+        for utm_epsg, idx in pd.Series(epsg).groupby(epsg).indices.items():
+            transformer = _get_transformer(_crs,int(utm_epsg))
+            len_mt[idx] = _projected_lengths(geoms_arr[idx],transformer)
+
+        gdf_copy = gdf if inplace else gdf.copy()
+        gdf_copy["utm_epsg"] = epsg
+        gdf_copy["len_mt"] = len_mt
         return gdf_copy
 
-    def group_geometries_by_proximity(self,gdf:object,geometry_col_name:str,tolerance_meter:float):
+    def group_geometries_by_proximity(self,gdf:object,geometry_col_name:str,tolerance_meter:float,n_jobs:int=1,fast:bool=False,chunk_size:int=100_000):
         """
         Group geometries based on spatial proximity using connected components analysis.
     
@@ -128,6 +206,9 @@ class SpatialLineCluster:
         where geometries within the tolerance distance are connected as edges, and connected
         components are identified as groups. Each group is assigned a unique 'parking_id'.
     
+        The distance is tested with the GEOS `dwithin` predicate, which requires GEOS 3.10
+        or later.
+
         Parameters
         ----------
         gdf : gpd.GeoDataFrame
@@ -138,6 +219,20 @@ class SpatialLineCluster:
         tolerance_meter : float, optional
             The distance tolerance in meters. Geometries within this distance are
             considered part of the same group. Default is 0.5 meters.
+        n_jobs : int, optional
+            Number of threads used to verify the candidate pairs found by the spatial
+            index. Negative values count back from the available CPUs: -1 uses all of
+            them, -2 all but one, and so on. 0 is not allowed. Default is 1, which
+            verifies the pairs within the spatial index query.
+        fast : bool, optional
+            If True, geometries are grouped when their bounding boxes, enlarged by the
+            tolerance, intersect. No distance is evaluated, so the groups may merge some
+            geometries that are not within the tolerance. Useful for very large inputs
+            where the tolerance is small compared with the geometries. Default is False.
+        chunk_size : int, optional
+            Number of geometries queried against the spatial index at once. The groups
+            found in each tile are merged into the previous ones, which bounds the memory
+            used by the candidate pairs. Must be at least 1. Default is 100000.
     
         Returns
         -------
@@ -145,38 +240,59 @@ class SpatialLineCluster:
             The input GeoDataFrame with an additional 'parking_id' column containing
             the group identifier (integer) for each geometry.
         """
-        # 1. Create the Graph
-        G = nx.Graph()
-        G.add_nodes_from(gdf.index)
+        if n_jobs == 0:
+            raise ValueError("⚠️ n_jobs can't be 0. e.g: 1, 4 or -1 (all the CPUs)")
+        if n_jobs < 0:
+            # Same convention as joblib: -1 uses all the CPUs, -2 all but one, ...
+            n_jobs = max((os.cpu_count() or 1) + 1 + n_jobs,1)
+        if chunk_size < 1:
+            raise ValueError(f"⚠️ chunk_size must be at least 1, got {chunk_size}. e.g: 100000")
 
-        # 2. Use Spatial Index
-        sindex = gdf.sindex
+        geoms_arr = np.asarray(gdf[geometry_col_name].values)
+
+        # The spatial index is built once for the geometry column and cached by GeoPandas
+        query = gdf[geometry_col_name].sindex.query
+
+        # Every geometry starts in its own group
+        n_components = len(geoms_arr)
+        labels = np.arange(n_components)
+
+        # The geometries are queried by tiles, so only the pairs of one tile are in memory
+        for start in range(0,len(geoms_arr),chunk_size):
+            tile = geoms_arr[start:start + chunk_size]
+
+            # 1. Use Spatial Index to find the pairs within the tolerance in a single query
+            if n_jobs == 1 and not fast:
+                left, right = query(tile,predicate="dwithin",distance=tolerance_meter)
+                left, right = _dedup_pairs(left + start,right) # Avoid compare the same pair twice
+            else:
+                # Candidates are the geometries touching the bounding box enlarged by the tolerance
+                bounds = shapely.bounds(tile) + np.array([-tolerance_meter,-tolerance_meter,tolerance_meter,tolerance_meter])
+                left, right = query(shapely.box(*bounds.T))
+                left, right = _dedup_pairs(left + start,right) # Avoid compare the same pair twice
 
-        for i,row in gdf.iterrows():
-            geom = row[geometry_col_name]
-            bbox = geom.buffer(tolerance_meter).bounds
-            get_indexes = sindex.intersection(bbox)
+                # 2. Verify the candidate pairs in parallel. The geometries are not prepared:
+                # the same geometry can be checked by several threads at once, and GEOS
+                # builds the index of a prepared geometry lazily without any locking
+                if not fast:
+                    mask = _dwithin_in_threads(geoms_arr[left],geoms_arr[right],tolerance_meter,n_jobs)
+                    left, right = left[mask], right[mask]
 
-            for j in get_indexes:
-                if i < j: # Avoid compare the same pair twice
-                    geom_j = gdf.loc[gdf.index[j],geometry_col_name]
-                    # Verify 
-                    if geom.buffer(tolerance_meter).intersects(geom_j):
-                        G.add_edge(i,j) 
+            # 3. Create the Graph between the current groups as a sparse adjacency matrix
+            adjacency = coo_matrix((np.ones(len(left),dtype=np.int8),(labels[left],labels[right])),shape=(n_components,n_components)).tocsr()
 
-        # 3. Identify connected component
-        components = list(nx.connected_components(G))
+            # 4. Identify connected component and merge the groups joined by this tile
+            n_components, merged = connected_components(adjacency,directed=False)
+            labels = merged[labels]
 
-        # DEBUGING 
-        print(f"Analysis completed: It was detected {len(components)} unique groups.")
+        logger.debug("Analysis completed: It was detected %d unique groups.",n_components)
 
-        # 4. Assign ID of the group
-        for group_id, nodes in enumerate(components):
-            gdf.loc[list(nodes),"parking_id"] = group_id
+        # 5. Assign ID of the group
+        gdf["parking_id"] = labels
 
         return gdf
 
-    def process_clustering(self,gdf:object,geometry_col_name:str,tolerance_in_meter:float):
+    def process_clustering(self,gdf:object,geometry_col_name:str,tolerance_in_meter:float,n_jobs:int=1,fast:bool=False,chunk_size:int=100_000):
         """
         Execute the complete spatial clustering pipeline for geometries.
     
@@ -195,6 +311,16 @@ class SpatialLineCluster:
         tolerance_in_meters : float
             The distance tolerance in meters for grouping. Geometries within this distance
             are considered part of the same cluster. Must be positive.
+        n_jobs : int, optional
+            Number of threads used to verify the proximity between geometries.
+            Negative values count back from the available CPUs (-1 uses all of them).
+            Default is 1.
+        fast : bool, optional
+            If True, geometries are grouped by their bounding boxes enlarged by the
+            tolerance, without evaluating the distance. Default is False.
+        chunk_size : int, optional
+            Number of geometries queried against the spatial index at once, which bounds
+            the memory used by the candidate pairs. Default is 100000.
     
         Returns
         -------
@@ -205,6 +331,6 @@ class SpatialLineCluster:
         """
         gdf_projected = self.add_utm_projection_metrics(gdf,geometry_col_name)
 
-        grouped = self.group_geometries_by_proximity(gdf_projected,geometry_col_name,tolerance_meter=tolerance_in_meter)
+        grouped = self.group_geometries_by_proximity(gdf_projected,geometry_col_name,tolerance_meter=tolerance_in_meter,n_jobs=n_jobs,fast=fast,chunk_size=chunk_size)
 
         return grouped
\ No newline at end of file
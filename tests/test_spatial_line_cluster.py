@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def test_parallel_verification_on_long_lines():
+    # A long line takes part in many candidate pairs, so several threads check it at the
+    # same time. Run in a subprocess so a crash inside GEOS fails the test instead of pytest
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {str(SRC)!r})
+        import numpy as np
+        import geopandas as gpd
+        import shapely
+        from spatial_line_cluster import SpatialLineCluster
+
+        rng = np.random.default_rng(0)
+        t = np.linspace(0, 100, 3000)
+        long_line = shapely.LineString(np.c_[t, np.sin(t) * 5])
+        xy = np.c_[rng.uniform(0, 100, 5000), rng.uniform(-6, 6, 5000)]
+        short_lines = [shapely.LineString([(x, y), (x + 0.2, y + 0.2)]) for x, y in xy]
+        gdf = gpd.GeoDataFrame(geometry=[long_line] + short_lines, crs="EPSG:3857")
+
+        cluster = SpatialLineCluster()
+        expected = cluster.group_geometries_by_proximity(gdf.copy(), "geometry", 0.3)["parking_id"].to_numpy()
+        for _ in range(10):
+            result = cluster.group_geometries_by_proximity(gdf.copy(), "geometry", 0.3, n_jobs=16)["parking_id"].to_numpy()
+            assert (result == expected).all()
+    """)
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr